@@ -1,3 +1,5 @@
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from . import models, schemas
 
@@ -20,6 +22,13 @@ def create_user(db:Session, user: schemas.UserCreate):
     fake_hashed_password = user.password + "notreallyhashed"
     db_user = models.User(email = user.email, hashed_password = fake_hashed_password)
     db.add(db_user)
+    db.flush()
+    # A new user owns no items yet; upsert in case a stale stats row already holds this id
+    db.execute(
+        _upsert(db, models.UserStats)
+        .values(user_id = db_user.id, item_count = 0)
+        .on_conflict_do_update(index_elements=["user_id"], set_={"item_count": 0})
+    )
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -35,6 +44,80 @@ def get_items(db:Session, skip: int = 0, limit: int = 100):
 def create_user_item(db:Session, item: schemas.ItemCreate, user_id: int):
     db_item = models.Item(**item.dict(), owner_id = user_id)
     db.add(db_item)
+    _increment_item_count(db, user_id)
     db.commit()
-    db.refresh()
-    return db_item
\ No newline at end of file
+    db.refresh(db_item)
+    return db_item
+
+def count_user_items(db:Session, user_id: int):
+    return db.query(func.count(models.Item.id)).filter(models.Item.owner_id == user_id).scalar()
+
+# The counter is bumped with a single UPDATE inside the caller's transaction,
+# so it is committed (or rolled back) together with the new item.
+# Users created before user_stats existed have no row yet; seed it from a COUNT
+# with an upsert, so a row inserted concurrently is incremented instead
+
+def _increment_item_count(db:Session, user_id: int):
+    updated = (
+        db.query(models.UserStats)
+        .filter(models.UserStats.user_id == user_id)
+        .update({models.UserStats.item_count: models.UserStats.item_count + 1}, synchronize_session=False)
+    )
+    if not updated:
+        db.flush()
+        db.execute(
+            _upsert(db, models.UserStats)
+            .values(user_id = user_id, item_count = count_user_items(db, user_id))
+            .on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"item_count": models.UserStats.item_count + 1},
+            )
+        )
+
+# ON CONFLICT is dialect specific; pick the insert construct for the bound engine
+
+def _upsert(db:Session, model):
+    dialects = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+    return dialects[db.get_bind().dialect.name](model)
+
+# Reads never write: a missing row is answered with a COUNT and left for
+# create_user_item or the reconciliation job to create
+
+def get_user_stats(db:Session, user_id: int):
+    db_stats = db.query(models.UserStats).filter(models.UserStats.user_id == user_id).first()
+    if db_stats is None:
+        return schemas.UserStats(user_id = user_id, item_count = count_user_items(db, user_id))
+    return db_stats
+
+# Recompute every user's item_count from the items table and repair any drift
+# Both statements run entirely in SQL, so a concurrent create_user_item
+# cannot have its increment overwritten by a count read earlier
+# Returns the number of rows that were corrected or created
+
+def reconcile_user_stats(db:Session):
+    actual_count = (
+        select(func.count(models.Item.id))
+        .where(models.Item.owner_id == models.UserStats.user_id)
+        .scalar_subquery()
+    )
+    fixed = db.execute(
+        update(models.UserStats)
+        .where(models.UserStats.item_count != actual_count)
+        .values(item_count = actual_count)
+        .execution_options(synchronize_session=False)
+    )
+
+    missing = (
+        select(
+            models.User.id,
+            select(func.count(models.Item.id))
+            .where(models.Item.owner_id == models.User.id)
+            .scalar_subquery(),
+        )
+        .where(~select(models.UserStats.user_id).where(models.UserStats.user_id == models.User.id).exists())
+    )
+    created = db.execute(
+        insert(models.UserStats).from_select(["user_id", "item_count"], missing)
+    )
+    db.commit()
+    return fixed.rowcount + created.rowcount
\ No newline at end of file
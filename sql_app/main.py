@@ -1,13 +1,25 @@
+import asyncio
+import logging
+
 from fastapi import Depends, FastAPI, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from . import crud, models, schemas
 from .database import SessionLocal, engine
 
 models.Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, so add any index missing from them
+for index in models.Item.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 app = FastAPI()
 
+logger = logging.getLogger(__name__)
+
+# Seconds between runs of the user_stats reconciliation job
+STATS_RECONCILE_INTERVAL = 60 * 60
+
 # Dependency
 # Create a SessionLocal class dependency per request
 # This dependency is used in a single request, and then close it once the request is finished
@@ -48,10 +60,48 @@ def read_user(user_id: int, db :Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
+# Served from the user_stats aggregate instead of loading User.items
+
+@app.get("/users/{user_id}/stats", response_model=schemas.UserStats)
+def read_user_stats(user_id: int, db: Session = Depends(get_db)):
+    db_user = crud.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return crud.get_user_stats(db, user_id=user_id)
+
+# Repairs drift in the user_stats aggregate; it runs outside any request,
+# so it opens its own session
+
+def reconcile_stats():
+    db = SessionLocal()
+    try:
+        repaired = crud.reconcile_user_stats(db)
+    finally:
+        db.close()
+    logger.info("user_stats reconciliation repaired %d rows", repaired)
+
+# Fill user_stats for existing users once at startup, then keep repairing it on a schedule
+
+async def reconcile_stats_periodically():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+        try:
+            await run_in_threadpool(reconcile_stats)
+        except Exception:
+            logger.exception("user_stats reconciliation failed")
+
+@app.on_event("startup")
+async def start_stats_reconciliation():
+    await run_in_threadpool(reconcile_stats)
+    app.state.stats_reconciler = asyncio.create_task(reconcile_stats_periodically())
+
 @app.post("/users/{user_id}/items", response_model=schemas.Item)
 def create_item_for_user(
     user_id: int, item: schemas.ItemCreate, db: Session = Depends(get_db)
 ):
+    db_user = crud.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     return crud.create_user_item(db=db, item=item, user_id=user_id)
 
 @app.get("/items/", response_model=list[schemas.Item])
@@ -21,6 +21,15 @@ class Item(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String, index=True)
     description = Column(String, index=True)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
 
-    owner = relationship("User", back_populates="items")
\ No newline at end of file
+    owner = relationship("User", back_populates="items")
+
+# Denormalized per-user aggregates, kept in step by crud.create_user_item
+# so that counts can be read without loading every Item row
+
+class UserStats(Base):
+    __tablename__ = 'user_stats'
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
\ No newline at end of file
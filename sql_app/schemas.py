@@ -29,5 +29,12 @@ class User(UserBase):
     is_active: bool
     items: list[Item] = []
 
+    class Config:
+        orm_mode = True
+
+class UserStats(BaseModel):
+    user_id: int
+    item_count: int
+
     class Config:
         orm_mode = True
\ No newline at end of file